@@ -1,9 +1,17 @@
 import pandas as pd
+import numpy as np
 import s3fs
 import pyarrow.parquet as pq
+from pyarrow.fs import PyFileSystem, FSSpecHandler
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
+import posixpath
+from fnmatch import fnmatchcase
+from concurrent.futures import ThreadPoolExecutor
+
+from feeder_kernel import COP
+from footer_cache import read_footer
 
 # --- CONFIGURATION ---
 BASE_BUCKET = "oedi-data-lake/nrel-pds-building-stock/end-use-load-profiles-for-us-building-stock/2021/resstock_amy2018_release_1"
@@ -18,15 +26,40 @@ def get_correct_timeseries_path(fs, root_path, state_abbr):
     # Option B: upgrade=0 / state=SC
     path_b = f"{root_path}/upgrade=0/state={state_abbr}"
     
-    if fs.exists(path_a):
-        return path_a
-    elif fs.exists(path_b):
-        return path_b
-    else:
-        # Debugging: Show what DOES exist
-        print(f"⚠️ Could not find standard path. Listing {root_path}:")
-        print(fs.ls(root_path)[:5])
-        return None
+    # Fire both checks at once: one S3 round-trip of latency instead of two
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        found_a = pool.submit(fs.exists, path_a)
+        found_b = pool.submit(fs.exists, path_b)
+
+        if found_a.result():
+            return path_a
+        elif found_b.result():
+            return path_b
+
+    # Debugging: Show what DOES exist
+    print(f"⚠️ Could not find standard path. Listing {root_path}:")
+    print(fs.ls(root_path)[:5])
+    return None
+
+def find_timeseries_file(fs, ts_path, bldg_id):
+    """
+    NREL names the files '{bldg_id}-0.parquet', so try that key directly (one HEAD).
+    Only on a miss fall back to a wildcard search over the folder listing
+    (s3fs keeps that listing in its dircache for any later homes).
+    Returns (path, info), where info is the HEAD result when we have one (else None).
+    """
+    candidate = f"{ts_path}/{bldg_id}-0.parquet"
+    try:
+        return candidate, fs.info(candidate)
+    except FileNotFoundError:
+        pass
+
+    # Same case-sensitive match (and sorted order) as fs.glob
+    pattern = f"*{bldg_id}*.parquet"
+    matches = sorted(
+        f for f in fs.ls(ts_path, detail=False) if fnmatchcase(posixpath.basename(f), pattern)
+    )
+    return (matches[0] if matches else None), None
 
 def main():
     print("--- Single Home Grid Stress Test (Auto-Fix) ---")
@@ -47,8 +80,12 @@ def main():
     heat_col = 'in.heating_fuel' if 'in.heating_fuel' in df_meta.columns else 'in.hvac_heating_type'
     sqft_col = 'in.sqft' if 'in.sqft' in df_meta.columns else 'in.geometry_floor_area'
 
+    # Match on the few distinct fuel labels, then compare integer codes per row
+    fuel = df_meta[heat_col].astype('category')
+    gas_codes = [i for i, c in enumerate(fuel.cat.categories) if 'gas' in str(c).lower()]
+
     targets = df_meta[
-        (df_meta[heat_col].str.contains('Gas', na=False, case=False)) &
+        (fuel.cat.codes.isin(gas_codes)) &
         (df_meta[sqft_col] > 2500)
     ]
 
@@ -64,7 +101,8 @@ def main():
     print(f"   Heat: {target_home[heat_col]}")
 
     # 3. Connect to S3
-    fs = s3fs.S3FileSystem(anon=True)
+    # Large blocks, no fill cache: pyarrow asks for exact byte ranges itself
+    fs = s3fs.S3FileSystem(anon=True, default_block_size=8 << 20, default_fill_cache=False)
     
     print(f"\n🔍 Auto-detecting S3 folder structure...")
     ts_path = get_correct_timeseries_path(fs, BY_STATE_ROOT, 'SC')
@@ -75,19 +113,16 @@ def main():
         
     print(f"✅ Verified Path: {ts_path}")
 
-    # 4. Find the File (Using a Flexible Glob)
-    # Note: NREL files are often named 'bldg_id-0.parquet' OR 'bldg_id-0.parquet'
-    # We use a wildcard search to capture either.
+    # 4. Find the File (Direct Key, Flexible Glob as Fallback)
     print(f"🔎 Searching for file matching *{bldg_id}* ...")
-    file_list = fs.glob(f"{ts_path}/*{bldg_id}*.parquet")
+    remote_file, remote_info = find_timeseries_file(fs, ts_path, bldg_id)
 
-    if not file_list:
+    if not remote_file:
         print(f"❌ Error: File not found for ID {bldg_id}")
         print("Debugging: Listing first 5 files in directory to verify naming convention:")
         print(fs.ls(ts_path)[:5])
         sys.exit(1)
 
-    remote_file = file_list[0]
     print(f"✅ Found: {remote_file}")
 
     # 5. Download & Analyze
@@ -98,53 +133,74 @@ def main():
     ]
 
     print("⬇️  Downloading interval data (this takes ~10s)...")
-    with fs.open(remote_file) as f:
-        df_ts = pd.read_parquet(f, columns=cols_to_read)
+    # pre_buffer coalesces the column-chunk ranges and fetches them concurrently
+    # (the footer comes from the local cache after the first run)
+    meta, _ = read_footer(fs, remote_file, info=remote_info)
+    with pq.ParquetFile(
+        remote_file,
+        metadata=meta,
+        filesystem=PyFileSystem(FSSpecHandler(fs)),
+        pre_buffer=True,
+        coerce_int96_timestamp_unit='ms'
+    ) as pf:
+        df_ts = pf.read(columns=cols_to_read, use_threads=True).to_pandas()
 
     df_ts['timestamp'] = pd.to_datetime(df_ts['timestamp'])
     df_ts.set_index('timestamp', inplace=True)
 
     # 6. Stress Test Simulation
     print("📈 Running simulation...")
-    COP = 3.0 # Efficiency of new Heat Pump
+    INV_COP = 1.0 / COP
     
     # Logic: New Load = Old Electric + (Old Gas / 3.0)
-    df_ts['hp_added_load'] = df_ts['out.natural_gas.heating.energy_consumption'] / COP
-    df_ts['total_load_after'] = df_ts['out.electricity.total.energy_consumption'] + df_ts['hp_added_load']
+    # Done on the raw arrays (no label alignment), then attached in one assign
+    elec = df_ts['out.electricity.total.energy_consumption'].to_numpy()
+    gas = df_ts['out.natural_gas.heating.energy_consumption'].to_numpy()
+    hp = gas * INV_COP
+    total = np.add(elec, hp)
+    df_ts = df_ts.assign(hp_added_load=hp, total_load_after=total)
 
     # 7. Plotting (Zooming in on Jan 17th Peak)
     start_date = '2018-01-17 00:00'
     end_date = '2018-01-18 23:59'
     zoom = df_ts[start_date:end_date]
 
-    plt.figure(figsize=(15, 6))
+    # Seaborn only supplies the stylesheet; plotting goes straight to matplotlib
     sns.set_theme(style="whitegrid")
+    fig, ax = plt.subplots(figsize=(15, 6))
+
+    # Pull the series out once; everything below works on plain arrays
+    idx = zoom.index.to_numpy()
+    base = zoom['out.electricity.total.energy_consumption'].to_numpy()
+    after = zoom['total_load_after'].to_numpy()
 
     # Before (Blue)
-    sns.lineplot(x=zoom.index, y=zoom['out.electricity.total.energy_consumption'], 
-                 label='Baseline (Gas Heat)', color='#1f77b4', linewidth=3)
+    ax.plot(idx, base, label='Baseline (Gas Heat)', color='#1f77b4', linewidth=3)
 
     # After (Red)
-    sns.lineplot(x=zoom.index, y=zoom['total_load_after'], 
-                 label='Simulated (Heat Pump)', color='#d62728', linewidth=3, linestyle='--')
+    ax.plot(idx, after, label='Simulated (Heat Pump)', color='#d62728', linewidth=3, linestyle='--')
 
     # Shade the gap
-    plt.fill_between(zoom.index, 
-                     zoom['out.electricity.total.energy_consumption'], 
-                     zoom['total_load_after'], 
-                     color='red', alpha=0.1, label='Added Grid Stress')
+    ax.fill_between(idx, base, after, color='red', alpha=0.1, label='Added Grid Stress')
 
-    plt.title(f"Grid Stress Test: Building {bldg_id} (Jan 17, 2018)", fontsize=16)
-    plt.ylabel("Load (kWh per 15-min)", fontsize=12)
-    plt.xlabel("Hour of Day", fontsize=12)
-    plt.legend(loc='upper left')
-    plt.tight_layout()
+    ax.set_title(f"Grid Stress Test: Building {bldg_id} (Jan 17, 2018)", fontsize=16)
+    ax.set_ylabel("Load (kWh per 15-min)", fontsize=12)
+    ax.set_xlabel("Hour of Day", fontsize=12)
+    ax.legend(loc='upper left')
+    fig.tight_layout()
 
     # Save
     img_name = "grid_stress_test_chart.png"
-    plt.savefig(img_name)
-    df_ts.to_csv("archetype_profile.csv")
-    print("✅ Data saved as 'archetype_profile.csv' for the dashboard.")
+    fig.savefig(img_name)
+    # Typed columns + per-row-group stats (4 days of 15-min data per group)
+    # let the dashboard skip straight to the cold snap
+    df_ts.reset_index().to_parquet(
+        "archetype_profile.parquet",
+        index=False,
+        compression='zstd',
+        row_group_size=4 * 96
+    )
+    print("✅ Data saved as 'archetype_profile.parquet' for the dashboard.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,42 @@
 import streamlit as st
+import csv
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import plotly.graph_objects as go
 
+from feeder_kernel import COP, feeder_load
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="IRA Grid Simulator", layout="wide")
+MAX_PLOT_POINTS = 500 # Longer windows get smoothed into 45-min bins
+
+# Only the metadata the dashboard touches (plus the NREL release-to-release renames)
+META_COLS = [
+    'bldg_id', 'in.city', 'in.county', 'in.sqft', 'in.geometry_floor_area', 'in.vintage',
+    'in.heating_fuel', 'in.hvac_heating_type', 'in.income'
+]
+# Low-cardinality labels are dictionary-encoded, so they land in pandas as categoricals
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+META_TYPES = {
+    'bldg_id': pa.string(),
+    'in.sqft': pa.float32(),
+    'in.geometry_floor_area': pa.float32(),
+    'in.county': CATEGORY,
+    'in.heating_fuel': CATEGORY,
+    'in.hvac_heating_type': CATEGORY,
+    'in.income': CATEGORY
+}
+
+# Risk table columns (only the ones this release ships are shown)
+DISPLAY_COLS = ['bldg_id', 'in.city', 'in.sqft', 'in.vintage', 'in.income', 'in.heating_fuel']
+
+def _arrow_dtype(pa_type):
+    # Arrow-backed pandas columns, except dictionaries which stay pandas categoricals
+    return None if pa.types.is_dictionary(pa_type) else pd.ArrowDtype(pa_type)
 
 # --- CUSTOM CSS FOR READABILITY ---
-st.markdown("""
+CUSTOM_CSS = """
     <style>
         /* Change the global font to a clean sans-serif */
         html, body, [class*="css"] {
@@ -18,35 +48,138 @@ st.markdown("""
             font-weight: 700 !important;
         }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # --- 1. LOAD DATA ---
-@st.cache_data
-def load_data():
+# Resource caches hand back the same objects on every rerun (no pickle/deep copy),
+# so nothing below may mutate what they return.
+@st.cache_resource
+def _load_meta_arrow():
+    """
+    The "Digital Twin" of SC Housing as a read-only Arrow table.
+    """
+    with open("sc_resstock_metadata.csv", newline="") as f:
+        header = next(csv.reader(f))
+
+    # Multi-threaded Arrow parser; numeric columns never get boxed as Python objects,
+    # and columns we don't use are skipped entirely
+    return pacsv.read_csv(
+        "sc_resstock_metadata.csv",
+        read_options=pacsv.ReadOptions(use_threads=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=[c for c in META_COLS if c in header],
+            column_types=META_TYPES,
+            strings_can_be_null=True # Blank cells are missing values, like pd.read_csv
+        )
+    )
+
+def _to_pandas(table):
+    return table.to_pandas(types_mapper=_arrow_dtype)
+
+@st.cache_resource
+def load_data(full_resolution=False):
     # Load the "Digital Twin" of SC Housing
     try:
-        df_meta = pd.read_csv("sc_resstock_metadata.csv")
+        df_meta = _to_pandas(_load_meta_arrow())
     except FileNotFoundError:
         st.error("⚠️ Metadata CSV not found. Run 'pull_resstock_data.py' first.")
         return pd.DataFrame(), pd.DataFrame()
 
     # Load the "Archetype" Load Profile (The single house timeseries)
     try:
-        df_ts = pd.read_csv("archetype_profile.csv")
-        df_ts['timestamp'] = pd.to_datetime(df_ts['timestamp'])
-        
         # Filter to the "Cold Snap" week for the visual (Jan 16-19, 2018)
-        start_date = '2018-01-16'
-        end_date = '2018-01-19'
-        mask = (df_ts['timestamp'] >= start_date) & (df_ts['timestamp'] <= end_date)
-        df_ts = df_ts.loc[mask]
+        # Pushed into the reader so row groups outside the window are skipped
+        start_date = pd.Timestamp('2018-01-16')
+        end_date = pd.Timestamp('2018-01-20')
+        df_ts = pd.read_parquet(
+            "archetype_profile.parquet",
+            columns=[
+                'timestamp',
+                'out.electricity.total.energy_consumption',
+                'out.natural_gas.heating.energy_consumption'
+            ],
+            filters=[('timestamp', '>=', start_date), ('timestamp', '<', end_date)]
+        )
+
+        # Thin out long windows before they hit Plotly (opt out with ?resolution=full)
+        if not full_resolution and len(df_ts) > MAX_PLOT_POINTS:
+            df_ts = (
+                df_ts.set_index('timestamp')
+                .rolling(window=3, center=True, min_periods=1).mean()
+                .iloc[::3]
+                .reset_index()
+            )
     except FileNotFoundError:
-        st.error("⚠️ Archetype CSV not found. Run 'analyze_single_home.py' first.")
+        st.error("⚠️ Archetype profile not found. Run 'analyze_single_home.py' first.")
         return pd.DataFrame(), pd.DataFrame()
 
     return df_meta, df_ts
 
-df_meta, df_archetype = load_data()
+@st.cache_resource
+def precompute_county_tables(_df_meta, _df_archetype, full_resolution=False):
+    """
+    Everything that depends on the county but not on the slider, done once.
+    The frames come from load_data(full_resolution), so the flag is the cache key.
+    Returns {county: (total_gas_homes, baseline_curve, gas_homes, high_risk, preview)}
+    with the baseline as a numpy array in MWh and the risk table preview as an Arrow table.
+    """
+    # 1. Identify "Addressable Market" (Gas Homes)
+    # Check column names (handling variation between NREL releases)
+    heat_col = 'in.heating_fuel' if 'in.heating_fuel' in _df_meta.columns else 'in.hvac_heating_type'
+
+    # Filter for Gas (Natural Gas, Propane, etc.)
+    if heat_col in _df_meta.columns:
+        fuel = _df_meta[heat_col]
+        gas_codes = [
+            i for i, c in enumerate(fuel.cat.categories)
+            if 'gas' in str(c).lower() or 'propane' in str(c).lower()
+        ]
+        gas_meta = _df_meta[fuel.cat.codes.isin(gas_codes)]
+    else:
+        gas_meta = _df_meta.iloc[0:0]
+
+    gas_by_county = dict(list(gas_meta.groupby('in.county', observed=True)))
+
+    # High Income ($100k+ or $200k+), matched once against the income bin labels
+    if 'in.income' in _df_meta.columns:
+        high_income_codes = [
+            code for code, label in enumerate(_df_meta['in.income'].cat.categories)
+            if '100' in str(label) or '200' in str(label)
+        ]
+
+    # The dashboard applies COP to the raw gas load itself; the 'hp_added_load' and
+    # 'total_load_after' columns in the profile are not used here
+    elec_curve = _df_archetype['out.electricity.total.energy_consumption'].to_numpy()
+    gas_curve = _df_archetype['out.natural_gas.heating.energy_consumption'].to_numpy()
+
+    tables = {}
+    for county in _df_meta['in.county'].dropna().unique():
+        gas_homes = gas_by_county.get(county, gas_meta.iloc[0:0])
+        total_gas_homes = len(gas_homes)
+
+        # Baseline: The existing load of ALL gas homes in this county
+        # (Using the archetype's electric load as the average), in MWh.
+        # Same kernel as the projection with zero converts, so both peaks round alike
+        baseline_curve = feeder_load(elec_curve, gas_curve, COP, total_gas_homes, 0)
+
+        if 'in.income' in gas_homes.columns:
+            high_risk = gas_homes[gas_homes['in.income'].cat.codes.isin(high_income_codes)]
+        else:
+            high_risk = gas_homes
+
+        # Risk table preview (falls back to all gas homes), built once as Arrow so
+        # st.dataframe ships the buffers as-is instead of converting pandas each rerun
+        shown = high_risk if not high_risk.empty else gas_homes
+        valid_cols = [c for c in DISPLAY_COLS if c in shown.columns]
+        preview = pa.Table.from_pandas(shown[valid_cols].head(50), preserve_index=False)
+
+        tables[county] = (total_gas_homes, baseline_curve, gas_homes, high_risk, preview)
+
+    return tables
+
+full_resolution = st.query_params.get("resolution") == "full"
+df_meta, df_archetype = load_data(full_resolution)
 
 # --- 2. SIDEBAR CONTROLS ---
 st.sidebar.title("Grid Stress Controls")
@@ -57,12 +190,9 @@ if not df_meta.empty:
     # Ensure we sort only valid values (drop NaNs)
     counties = sorted(df_meta['in.county'].dropna().unique())
     selected_county = st.sidebar.selectbox("Select County / Feeder", counties)
-    
-    # Filter metadata for this county
-    county_homes = df_meta[df_meta['in.county'] == selected_county]
 else:
     st.sidebar.warning("No data loaded")
-    county_homes = pd.DataFrame()
+    selected_county = None
 
 # B. The "What-If" Slider
 adoption_rate = st.sidebar.slider(
@@ -75,11 +205,11 @@ adoption_rate = st.sidebar.slider(
 
 st.sidebar.markdown("---")
 st.sidebar.info(
-    """
+    f"""
     **Simulation Logic:**
     1. Identify Gas-Heated Homes (Target Market).
     2. Apply Adoption Rate.
-    3. Inject simulated Heat Pump load (COP 3.0).
+    3. Inject simulated Heat Pump load (COP {COP}).
     4. Calculate new aggregate Feeder Load.
     """
 )
@@ -88,38 +218,26 @@ st.sidebar.info(
 st.title("IRA Electrification Impact Simulator")
 st.markdown(f"**Feeder Analysis:** {selected_county} (South Carolina)")
 
-if not county_homes.empty and not df_archetype.empty:
+if selected_county is not None and not df_archetype.empty:
     
     # --- CALCULATIONS ---
-    # 1. Identify "Addressable Market" (Gas Homes)
-    # Check column names (handling variation between NREL releases)
-    heat_col = 'in.heating_fuel' if 'in.heating_fuel' in county_homes.columns else 'in.hvac_heating_type'
-    
-    # Filter for Gas (Natural Gas, Propane, etc.)
-    if heat_col in county_homes.columns:
-        gas_homes = county_homes[county_homes[heat_col].str.contains('Gas|Propane', case=False, na=False)]
-    else:
-        st.error(f"Could not find heating column. Available: {county_homes.columns}")
-        gas_homes = pd.DataFrame()
+    # 1. Addressable Market and baseline (precomputed per county)
+    county_tables = precompute_county_tables(df_meta, df_archetype, full_resolution)
+    total_gas_homes, baseline_curve, gas_homes, high_risk, preview = county_tables[selected_county]
 
-    total_gas_homes = len(gas_homes)
+    if 'in.heating_fuel' not in df_meta.columns and 'in.hvac_heating_type' not in df_meta.columns:
+        st.error(f"Could not find heating column. Available: {df_meta.columns}")
     
     # 2. Number of Converts
     num_converts = int(total_gas_homes * (adoption_rate / 100))
     
     # 3. Scale the Loads (Math: Single Home * Number of Homes)
-    # We divide by 1000 to convert kWh -> MWh (Megawatts)
-    
-    # Baseline: The existing load of ALL gas homes in this county
-    # (Using the archetype's electric load as the average)
-    baseline_curve = (df_archetype['out.electricity.total.energy_consumption'] * total_gas_homes) / 1000
-    
-    # Added Load: The curve of the NEW heat pumps
-    # (We calculated 'hp_added_load' in the previous script)
-    added_curve = (df_archetype['hp_added_load'] * num_converts) / 1000
-    
-    # Total New Load
-    new_total_curve = baseline_curve + added_curve
+    # Total New Load: the baseline plus the NEW heat pumps
+    new_total_curve = feeder_load(
+        df_archetype['out.electricity.total.energy_consumption'].to_numpy(),
+        df_archetype['out.natural_gas.heating.energy_consumption'].to_numpy(),
+        COP, total_gas_homes, num_converts
+    )
     
     # Peak Analysis
     old_peak = baseline_curve.max()
@@ -173,31 +291,19 @@ if not county_homes.empty and not df_archetype.empty:
     st.caption("These homes match the 'High Income + Gas Heat' profile (Free Rider Risk).")
     
     # CHECK: Does the income column actually exist?
-    high_risk = pd.DataFrame()
-    
     if 'in.income' in gas_homes.columns:
-        # If yes, filter for High Income ($100k+ or $200k+)
-        # Using a regex to catch different income bin labels
-        high_risk = gas_homes[gas_homes['in.income'].str.contains('100|200', regex=True, na=False)]
-        
+        # If yes, high_risk was already filtered for High Income ($100k+ or $200k+)
         if not high_risk.empty:
             st.success(f"Identified {len(high_risk)} high-income households for targeting.")
         else:
-            st.info("No high-income households found in this subset.")
-            high_risk = gas_homes # Fallback to showing all gas homes
+            st.info("No high-income households found in this subset.") # Preview falls back to all gas homes
     else:
         # If no, show a warning and skip the income filter
         st.warning("⚠️ Income data not available for this region. Showing all eligible gas homes.")
-        high_risk = gas_homes
 
-    # Display clean table
-    display_cols = ['bldg_id', 'in.city', 'in.sqft', 'in.vintage', 'in.income', 'in.heating_fuel']
-    
-    # Only try to display columns that actually exist
-    valid_cols = [c for c in display_cols if c in high_risk.columns]
-    
+    # Display clean table (precomputed Arrow preview)
     st.dataframe(
-        high_risk[valid_cols].head(50),
+        preview,
         use_container_width=True,
         hide_index=True
     )
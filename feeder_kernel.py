@@ -0,0 +1,26 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError: # Optional: the NumPy kernel below is used instead
+    numba = None
+
+COP = 3.0 # Efficiency of new Heat Pump (shared by analyze_single_home.py and app.py)
+
+# Lives outside app.py so Streamlit reruns reuse one compiled dispatcher
+# (the script body is re-executed on every interaction; imported modules are not).
+
+# Aggregate load (MWh) = every gas home's electric load + the converts' heat pumps (gas / COP).
+# Trivial for one archetype; JIT-compiled so multi-archetype county scans stay fast.
+# No fastmath: it would reassociate the divide and break exact agreement between the
+# baseline (n_converts=0) and projected curves, and assume NaN-free profiles.
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def feeder_load(elec, gas, cop, n_homes, n_converts):
+        out = np.empty_like(elec)
+        for i in numba.prange(elec.size):
+            out[i] = (elec[i] * n_homes + gas[i] * n_converts / cop) / 1000.0
+        return out
+else:
+    def feeder_load(elec, gas, cop, n_homes, n_converts):
+        return (elec * n_homes + gas * (n_converts / cop)) / 1000.0
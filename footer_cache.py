@@ -0,0 +1,67 @@
+import hashlib
+import os
+import pickle
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- CONFIGURATION ---
+CACHE_DIR = "_footer_cache"
+MAX_ENTRIES = 8
+FOOTER_BLOCK_SIZE = 1 << 16
+
+def _cache_file(path, etag):
+    key = hashlib.sha1(f"{path}|{etag}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.pkl")
+
+def _evict():
+    """
+    Keeps the cache bounded: drops the least recently used footers past MAX_ENTRIES.
+    """
+    entries = [os.path.join(CACHE_DIR, f) for f in os.listdir(CACHE_DIR) if f.endswith(".pkl")]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for stale in entries[MAX_ENTRIES:]:
+        os.remove(stale)
+
+def read_footer(fs, path, info=None):
+    """
+    Returns (FileMetaData, arrow schema) for a remote Parquet file.
+    Footers are cached on disk keyed by S3 ETag, so re-runs skip the footer round-trip
+    and a re-published file is picked up automatically.
+    Pass `info` if the caller already has fs.info(path) to skip a second HEAD.
+    """
+    if info is None:
+        info = fs.info(path)
+    etag = info.get("ETag", "")
+    cache_file = _cache_file(path, etag)
+
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(cache_file)
+            meta = pq.read_metadata(pa.BufferReader(entry["footer"]))
+            schema = pa.ipc.read_schema(pa.BufferReader(entry["schema"]))
+            return meta, schema
+        except Exception:
+            os.remove(cache_file) # Corrupt entry, fall through and refetch
+
+    # Small blocks: we only want the tail of the file, not a full read-ahead block
+    with fs.open(path, "rb", block_size=FOOTER_BLOCK_SIZE) as f:
+        pf = pq.ParquetFile(f)
+        meta, schema = pf.metadata, pf.schema_arrow
+
+    # Footer-only Parquet file: round-trips through pq.read_metadata
+    sink = pa.BufferOutputStream()
+    meta.write_metadata_file(sink)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_file, "wb") as f:
+        pickle.dump({
+            "path": path,
+            "footer": sink.getvalue().to_pybytes(),
+            "schema": schema.serialize().to_pybytes()
+        }, f)
+    _evict()
+
+    return meta, schema
@@ -1,6 +1,6 @@
 import pandas as pd
 import s3fs
-import pyarrow.parquet as pq
+import pyarrow.dataset as ds
 import sys
 import os
 
@@ -14,6 +14,31 @@ FULL_S3_PATH = f"{BASE_BUCKET}/{RELEASE_YEAR}/{DATASET_NAME}/{TABLE_NAME}"
 TARGET_STATE = 'SC' 
 OUTPUT_FILE = "sc_resstock_metadata.csv"
 
+COLS_TO_KEEP = [
+    'bldg_id', 
+    'in.city', 'in.county', 'in.sqft', 'in.vintage',
+    'in.heating_fuel', 'in.hvac_cooling_type', 
+    'in.income', 'in.usage_level'
+]
+
+def resolve_columns(available):
+    """
+    Smart Filter: maps the columns we want onto what this release actually ships.
+    Resolved against the dataset schema so the scan only reads what we keep.
+    """
+    final_cols = []
+    for c in COLS_TO_KEEP:
+        if c in available:
+            final_cols.append(c)
+        elif c == 'bldg_id' and '__index_level_0__' in available:
+            # Unnamed pandas index; renamed after the read
+            final_cols.append('__index_level_0__')
+        elif c == 'in.sqft' and 'in.geometry_floor_area' in available:
+            final_cols.append('in.geometry_floor_area')
+        elif c == 'in.heating_fuel' and 'in.hvac_heating_type' in available:
+            final_cols.append('in.hvac_heating_type')
+    return final_cols
+
 def main():
     print(f"--- Grid Stress Simulator Data Ingest (Diagnostic Mode) ---")
     
@@ -26,65 +51,59 @@ def main():
     
     print(f"⬇️  Streaming housing profiles for {TARGET_STATE} from {FULL_S3_PATH}...")
     try:
-        dataset = pq.ParquetDataset(
-            FULL_S3_PATH, 
-            filesystem=fs, 
-            filters=[('in.state', '=', TARGET_STATE)]
+        dataset = ds.dataset(
+            FULL_S3_PATH,
+            filesystem=fs,
+            format="parquet",
+            partitioning="hive"
+        )
+
+        # Project only the columns we keep so the scanner skips the rest
+        read_cols = resolve_columns(dataset.schema.names)
+        table = dataset.to_table(
+            filter=(ds.field('in.state') == TARGET_STATE),
+            columns=read_cols,
+            use_threads=True
         )
-        df = dataset.read().to_pandas()
+        # Release Arrow buffers as each column converts, and keep strings Arrow-backed
+        # instead of exploding them into Python objects.
+        # ignore_metadata: don't let the pandas metadata rebuild bldg_id as the Index,
+        # so it arrives as a plain column (no reset_index / rename round-trip)
+        df = table.to_pandas(
+            self_destruct=True,
+            split_blocks=True,
+            ignore_metadata=True,
+            types_mapper=pd.ArrowDtype
+        )
+        del table
         
         # --- DIAGNOSTIC PRINT ---
         print(f"\n🧐 RAW DATA INSPECTION:")
-        print(f"   Index Name: {df.index.name}")
         print(f"   Columns: {list(df.columns[:5])}...") # Show first 5
 
-        # --- THE FIX: FORCE INDEX TO COLUMN ---
-        # If the ID is hidden in the index, pull it out
-        print("🔧 Resetting Index to retrieve Building ID...")
-        df.reset_index(inplace=True)
-        
-        # If the index didn't have a name, Pandas names the new column 'index'
-        if 'index' in df.columns and 'bldg_id' not in df.columns:
-            print("🔧 Renaming 'index' column to 'bldg_id'...")
-            df.rename(columns={'index': 'bldg_id'}, inplace=True)
+        # An unnamed pandas index is stored as '__index_level_0__'
+        if '__index_level_0__' in df.columns and 'bldg_id' not in df.columns:
+            print("🔧 Renaming '__index_level_0__' column to 'bldg_id'...")
+            df.rename(columns={'__index_level_0__': 'bldg_id'}, inplace=True)
 
         # Verify we have the ID now
         if 'bldg_id' not in df.columns:
-            print("❌ CRITICAL ERROR: Could not find 'bldg_id' even after reset!")
+            print("❌ CRITICAL ERROR: Could not find 'bldg_id' in the metadata!")
             print(f"   Available columns: {list(df.columns)}")
             sys.exit(1)
         else:
-            print(f"✅ 'bldg_id' successfully recovered.")
+            print(f"✅ 'bldg_id' found.")
 
     except Exception as e:
         print(f"❌ Error reading Parquet data: {e}")
         sys.exit(1)
 
-    # 2. SELECT COLUMNS
-    cols_to_keep = [
-        'bldg_id', 
-        'in.city', 'in.county', 'in.sqft', 'in.vintage',
-        'in.heating_fuel', 'in.hvac_cooling_type', 
-        'in.income', 'in.usage_level'
-    ]
-
-    # Smart Filter (Handle column renames)
-    final_cols = []
-    for c in cols_to_keep:
-        if c in df.columns:
-            final_cols.append(c)
-        elif c == 'in.sqft' and 'in.geometry_floor_area' in df.columns:
-            final_cols.append('in.geometry_floor_area')
-        elif c == 'in.heating_fuel' and 'in.hvac_heating_type' in df.columns:
-            final_cols.append('in.hvac_heating_type')
-
-    # 3. SAVE
-    df_clean = df[final_cols]
-    df_clean.to_csv(OUTPUT_FILE, index=False)
+    # 2. SAVE
+    df.to_csv(OUTPUT_FILE, index=False)
     
     print(f"\n💾 Data saved to: {OUTPUT_FILE}")
-    print(f"   Rows: {len(df_clean)}")
-    print(f"   Columns: {list(df_clean.columns)}") # Verify bldg_id is here
+    print(f"   Rows: {len(df)}")
+    print(f"   Columns: {list(df.columns)}") # Verify bldg_id is here
 
 if __name__ == "__main__":
     main()
\ No newline at end of file